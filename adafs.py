@@ -3,20 +3,64 @@
 import os
 import sys
 import argparse
+import functools
+import itertools
 import shutil
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-logging.basicConfig(level=logging.DEBUG)
-
+# Number of threads used to parse Ada sources in build_view.
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Number of characters scanned for a package declaration before falling back
+# to reading the whole file.
+_PREFIX_SIZE = 8192
+
+# Regex to find the package declaration and capture the full name.
+#
+# Breakdown:
+# ^                  - Matches the start of a new line (due to re.MULTILINE).
+# \s* - Matches any leading whitespace.
+# (?:private\s+)?    - An optional non-capturing group for 'private'.
+# package            - Matches the keyword 'package' (case-insensitive).
+# (?:\s+body)?       - An optional non-capturing group for 'body'.
+# \s+                - Matches the space(s) after 'package' or 'body'.
+# ( ... )            - The capturing group for the full package name:
+#   [a-zA-Z_]\w* - Matches the first identifier (e.g., "Ada").
+#   (?:\.[a-zA-Z_]\w*)* - A non-capturing group that matches zero or more
+#                         occurrences of a dot followed by an identifier
+#                         (e.g., ".Strings", ".Unbounded").
+_PACKAGE_RE = re.compile(
+    r"^\s*(?:private\s+)?package(?:\s+body)?\s+([a-zA-Z_]\w*(?:\.[a-zA-Z_]\w*)*)",
+    re.MULTILINE | re.IGNORECASE,
+)
+# Regex matching, at the start of a line, either:
+# (?P<end>end)       - the 'end' keyword that closes a block, or
+# a keyword that may start a new block/scope, where:
+#   (?P<name>...)    - captures the identifier of a procedure or function
+#                      declaration,
+#   (?P<is>...)      - is set when 'is' follows on the same line, i.e. the
+#                      keyword reliably opens a block.
+_ENTITY_RE = re.compile(
+    r"^[^\S\n]*(?:"
+    r"(?P<end>end)\b"
+    r"|(?:(?:procedure|function)(?=[^\S\n]+(?P<name>[a-zA-Z_]\w*))?|package|task|protected)\b"
+    r"(?P<is>.*\bis\b)?"
+    r")",
+    re.MULTILINE | re.IGNORECASE,
+)
+# Regex to find an Ada comment, up to the end of the line.
+_COMMENT_RE = re.compile(r"--[^\n]*")
 
 
 def _find_package_in_string(source_code: str) -> Optional[str]:
     """Helper function to find a package name within a source string."""
-    # Regex to find the package declaration and capture the full name.
-    package_regex = r"^\s*(?:private\s+)?package(?:\s+body)?\s+([a-zA-Z_]\w*(?:\.[a-zA-Z_]\w*)*)"
-    match = re.search(package_regex, source_code, re.MULTILINE | re.IGNORECASE)
+    # Cheap substring test to skip the regex on files without the keyword.
+    if "package" not in source_code.lower():
+        return None
+    match = _PACKAGE_RE.search(source_code)
     return match.group(1) if match else None
 
 def _find_procs_or_funcs_in_string(source_code: str) -> Optional[str]:
@@ -27,37 +71,37 @@ def _find_procs_or_funcs_in_string(source_code: str) -> Optional[str]:
     differentiate between top-level and nested entities. If multiple top-level
     entities are found, their names are concatenated with ' AND '.
     """
+    # Cheap substring test to skip the scan on files without the keywords.
+    lowered = source_code.lower()
+    if "procedure" not in lowered and "function" not in lowered:
+        return None
+
     top_level_entities = []
     nesting_level = 0
 
-    # Regex to find any procedure or function declaration.
-    decl_re = re.compile(r"^\s*(procedure|function)\s+([a-zA-Z_]\w*)", re.IGNORECASE)
-    # Regex to find keywords that reliably start a new block/scope.
-    # We look for a declaration followed by 'is' on the same line.
-    block_start_re = re.compile(r"^\s*(package|procedure|function|task|protected)\b.*\bis\b", re.IGNORECASE)
-    # Regex to find the 'end' keyword that closes a block.
-    block_end_re = re.compile(r"^\s*end\b", re.IGNORECASE)
+    # Remove comments to avoid accidentally matching keywords inside them.
+    source_code = _COMMENT_RE.sub('', source_code)
 
-    for line in source_code.splitlines():
-        # Remove comments to avoid accidentally matching keywords inside them.
-        clean_line = line.split('--')[0]
+    # A single pass over the source only stops on lines starting with a
+    # keyword we care about, instead of running several regexes per line.
+    for match in _ENTITY_RE.finditer(source_code):
+        # A line starting with 'end' decreases nesting.
+        if match.group('end'):
+            if nesting_level > 0:
+                nesting_level -= 1
+            continue
 
         # First, check for a new declaration at the CURRENT nesting level.
         # This must be done before updating the level.
-        match = decl_re.match(clean_line)
-        if match and nesting_level == 0:
+        entity_name = match.group('name')
+        if entity_name and nesting_level == 0:
             # If we're at the top level (not nested), this is a top-level entity.
-            entity_name = match.group(2)
             top_level_entities.append(entity_name)
-        
+
         # Second, update the nesting level for the next line.
         # A line with 'procedure ... is', 'package ... is', etc., increases nesting.
-        if block_start_re.search(clean_line):
+        if match.group('is'):
             nesting_level += 1
-        # A line starting with 'end' decreases nesting.
-        elif block_end_re.search(clean_line):
-            if nesting_level > 0:
-                nesting_level -= 1
 
     if not top_level_entities:
         return None
@@ -75,6 +119,9 @@ def get_ada_entity_name(file_path: str) -> Optional[str]:
     This function first searches for a package declaration. If none is found, 
     it then searches for top-level procedure or function declarations.
 
+    Results are cached per (path, modification time, size), so files that did
+    not change are only parsed once per process.
+
     Args:
         file_path: The path to the Ada source file.
 
@@ -82,9 +129,30 @@ def get_ada_entity_name(file_path: str) -> Optional[str]:
         The full package name, the procedure/function name(s), or None
         if no primary entity is found or the file cannot be read.
     """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        # Let the uncached reader report the error.
+        return _read_ada_entity_name(file_path)
+    return _cached_ada_entity_name(file_path, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=None)
+def _cached_ada_entity_name(file_path: str, mtime_ns: int, size: int) -> Optional[str]:
+    """Memoized _read_ada_entity_name, keyed by the file's stat signature."""
+    return _read_ada_entity_name(file_path)
+
+def _read_ada_entity_name(file_path: str) -> Optional[str]:
+    """Helper function reading and parsing file_path for get_ada_entity_name."""
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            source_code = f.read()
+            # First, attempt to find a package name. Package declarations sit
+            # near the top of the file, so only scan a bounded prefix (read up
+            # to the end of its last line) before paying for the whole file.
+            source_code = f.read(_PREFIX_SIZE) + f.readline()
+            package_name = _find_package_in_string(source_code)
+            if package_name:
+                return package_name
+            rest = f.read()
     except FileNotFoundError:
         print(f"Error: File not found at '{file_path}'")
         return None
@@ -92,77 +160,35 @@ def get_ada_entity_name(file_path: str) -> Optional[str]:
         print(f"Error reading file '{file_path}': {e}")
         return None
 
-    # First, attempt to find a package name.
-    package_name = _find_package_in_string(source_code)
-    if package_name:
-        return package_name
+    if rest:
+        source_code += rest
+        package_name = _find_package_in_string(source_code)
+        if package_name:
+            return package_name
 
     # If no package, attempt to find procedure(s) or function(s).
     return _find_procs_or_funcs_in_string(source_code)
 
 
 
-def get_ada_full_package_name(file_path: str) -> str | None:
-    """
-    Extracts the full package name from an Ada source file.
-
-    This function reads an Ada source file (.ads or .adb), uses a regular
-    expression to find the package declaration, and returns the full,
-    dot-separated package name. For example, for "A.B.C", it returns "A.B.C".
-
-    Args:
-        file_path: The path to the Ada source file.
-
-    Returns:
-        The full package name as a string, or None if no package
-        declaration is found or the file cannot be read.
-    """
-    # Regex to find the package declaration and capture the full name.
-    #
-    # Breakdown:
-    # ^                  - Matches the start of a new line (due to re.MULTILINE).
-    # \s* - Matches any leading whitespace.
-    # package            - Matches the keyword 'package' (case-insensitive).
-    # (?:\s+body)?       - An optional non-capturing group for 'body'.
-    # \s+                - Matches the space(s) after 'package' or 'body'.
-    # ( ... )            - The capturing group for the full package name:
-    #   [a-zA-Z_]\w* - Matches the first identifier (e.g., "Ada").
-    #   (?:\.[a-zA-Z_]\w*)* - A non-capturing group that matches zero or more
-    #                         occurrences of a dot followed by an identifier
-    #                         (e.g., ".Strings", ".Unbounded").
-    #
-    package_regex = r"^\s*package(?:\s+body)?\s+([a-zA-Z_]\w*(?:\.[a-zA-Z_]\w*)*)"
-
-    try:
-        # Open and read the file. Using 'errors=ignore' for robustness.
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            source_code = f.read()
-    except FileNotFoundError:
-        # Handle cases where the file does not exist.
-        print(f"Error: File not found at '{file_path}'")
-        return None
-    except Exception as e:
-        # Handle other potential I/O errors.
-        print(f"Error reading file '{file_path}': {e}")
-        return None
-
-    # Search the source code using the regex.
-    # re.MULTILINE (or re.M) allows '^' to match the start of each line.
-    # re.IGNORECASE (or re.I) makes matching case-insensitive.
-    match = re.search(package_regex, source_code, re.MULTILINE | re.IGNORECASE)
-
-    if match:
-        # The first captured group (group(1)) is our full package name.
-        return match.group(1)
-
-    # Return None if no match was found.
-    return None
-
 def map_to_virtual(src_root, path):
     """Return the virtual path for a single GNAT-crunched file."""
-    rel = os.path.relpath(path, src_root)
-    dirs, fname = os.path.split(rel)
-    base, ext = os.path.splitext(fname)
+    # Paths produced by the walk start with src_root, so split them with plain
+    # string operations instead of several os.path calls per file.
+    prefix = src_root.rstrip(os.sep) + os.sep
+    if path.startswith(prefix):
+        rel = path[len(prefix):]
+    else:
+        rel = os.path.relpath(path, src_root)
+    slash = rel.rfind(os.sep)
+    dirs = rel[:slash] if slash >= 0 else ''
+    fname = rel[slash + 1:]
+    # As with os.path.splitext, a leading dot does not start an extension.
+    dot = fname.rfind('.')
+    if dot > 0:
+        base, ext = fname[:dot], fname[dot:]
+    else:
+        base, ext = fname, ''
 
     logging.debug("-----")
     logging.debug("src_root %s - path %s", src_root, path)
@@ -173,48 +199,112 @@ def map_to_virtual(src_root, path):
     if not package:
         package = base + "KNUNCHED"
     file_name = package + ext.lower()
-    return os.path.join(dirs, file_name)
+    return dirs + os.sep + file_name if dirs else file_name
 
 
-def build_view(src_root, mount_root):
-    """Create a plain directory hierarchy representing the virtual FS."""
-    created_dirs = set()
-    for root, _, files in os.walk(src_root):
-        rel_dir = os.path.relpath(root, src_root)
-        target_dir = os.path.join(mount_root, rel_dir) if rel_dir != '.' else mount_root
-        os.makedirs(target_dir, exist_ok=True)
-        created_dirs.add(target_dir)
-        for f in files:
-            if not (f.endswith('.ads') or f.endswith('.adb')):
-                continue
-            src_file = os.path.join(root, f)
-            virt = map_to_virtual(src_root, src_file)
-            dest = os.path.join(mount_root, virt)
-            dest_dir = os.path.dirname(dest)
-            if dest_dir not in created_dirs:
-                os.makedirs(dest_dir, exist_ok=True)
-                created_dirs.add(dest_dir)
-            if not os.path.exists(dest):
-                # Use absolute symlinks so later directory moves don't break
-                # the references when running post-processing passes.
-                os.symlink(os.path.abspath(src_file), dest)
-
-    # Make all created directories read-only to mimic a read-only mount
-    for d in sorted(created_dirs, key=len, reverse=True):
+def _walk_ada_sources(src_root):
+    """
+    Yield (rel_dir, ada_files) for src_root and every directory below it.
+
+    rel_dir is relative to src_root ('' for src_root itself) and ada_files
+    lists the paths of the .ads/.adb files directly inside that directory.
+    Directories are visited in the same order as os.walk, symlinked
+    directories are not descended into and unreadable ones are skipped, but
+    each directory is listed with a single os.scandir call whose entries
+    carry their file type.
+    """
+    stack = [(src_root, '')]
+    while stack:
+        path, rel_dir = stack.pop()
         try:
-            os.chmod(d, 0o755)
+            with os.scandir(path) as it:
+                entries = list(it)
         except OSError:
-            pass
+            continue
+        subdirs = []
+        ada_files = []
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    sub_rel = rel_dir + os.sep + entry.name if rel_dir else entry.name
+                    subdirs.append((entry.path, sub_rel))
+            elif entry.name.endswith(('.ads', '.adb')):
+                ada_files.append(entry.path)
+        yield rel_dir, ada_files
+        stack.extend(reversed(subdirs))
 
 
-def _categorize_dir(path: str, pkg_prefix: str) -> None:
-    entries = os.listdir(path)
-    subdirs = [d for d in entries if os.path.isdir(os.path.join(path, d))]
-    for d in subdirs:
-        _categorize_dir(os.path.join(path, d), f"{pkg_prefix}.{d}")
+def build_view(src_root, mount_root):
+    """Create a plain directory hierarchy representing the virtual FS."""
+    # Walk from the absolute source root so the walked paths can be used as
+    # symlink targets as-is.
+    src_root = os.path.abspath(src_root)
+    dirs = []
+    for rel_dir, ada_files in _walk_ada_sources(src_root):
+        if not rel_dir:
+            target_dir = mount_root
+            os.makedirs(target_dir, exist_ok=True)
+        else:
+            # Parents are walked first, so a single mkdir is enough.
+            target_dir = os.path.join(mount_root, rel_dir)
+            try:
+                os.mkdir(target_dir)
+            except FileExistsError:
+                pass
+        dirs.append((target_dir, ada_files))
+
+    # Parsing the sources is I/O bound, so map them on a thread pool. Results
+    # come back in walk order, which keeps the "first one wins" collision
+    # behaviour unchanged.
+    src_files = itertools.chain.from_iterable(ada_files for _, ada_files in dirs)
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        virts = executor.map(functools.partial(map_to_virtual, src_root), src_files)
+        for target_dir, ada_files in dirs:
+            # map_to_virtual keeps files in their source directory, so all the
+            # links of this batch go into target_dir: open it once and create
+            # them, then set its mode, relative to it instead of resolving the
+            # full path each time.
+            dir_fd = os.open(target_dir, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+            try:
+                # Collisions are tracked in memory instead of stat'ing every
+                # link; links left over from an earlier build are kept as well.
+                created_links = set()
+                for src_file in ada_files:
+                    name = os.path.basename(next(virts))
+                    if name in created_links:
+                        continue
+                    try:
+                        # Use absolute symlinks so later directory moves don't
+                        # break the references when running post-processing
+                        # passes.
+                        os.symlink(src_file, name, dir_fd=dir_fd)
+                    except FileExistsError:
+                        pass
+                    created_links.add(name)
+
+                # Make the directory read-only to mimic a read-only mount
+                try:
+                    os.fchmod(dir_fd, 0o755)
+                except OSError:
+                    pass
+            finally:
+                os.close(dir_fd)
+
 
-    has_spec = os.path.isfile(os.path.join(path, os.path.basename(path) + ".ads"))
-    has_body = os.path.isfile(os.path.join(path, os.path.basename(path) + ".adb"))
+def _categorize_dir(path: str, pkg_prefix: str) -> None:
+    # A single scandir gives both the entry names and their cached types. The
+    # view only holds real directories and symlinks to files.
+    with os.scandir(path) as it:
+        entries = {e.name: e for e in it}
+    subdirs = [e for e in entries.values() if e.is_dir(follow_symlinks=False)]
+    for e in subdirs:
+        _categorize_dir(e.path, f"{pkg_prefix}.{e.name}")
+
+    base = os.path.basename(path)
+    spec = entries.get(base + ".ads")
+    body = entries.get(base + ".adb")
+    has_spec = spec is not None and spec.is_file()
+    has_body = body is not None and body.is_file()
     if subdirs and (has_spec or has_body):
         parent = os.path.dirname(path)
         group_dir = os.path.join(parent, pkg_prefix)
@@ -228,21 +318,51 @@ def _categorize_dir(path: str, pkg_prefix: str) -> None:
 
 
 def categorize_directory(root: str) -> None:
-    for name in os.listdir(root):
-        p = os.path.join(root, name)
-        if os.path.isdir(p):
-            _categorize_dir(p, name)
+    with os.scandir(root) as it:
+        subdirs = [e for e in it if e.is_dir(follow_symlinks=False)]
+    for e in subdirs:
+        _categorize_dir(e.path, e.name)
 
 
-def print_tree(path: str) -> None:
-    """Print directory tree of path if the `tree` command exists."""
+def mount(source: str, mountpoint: str) -> None:
+    """Build the virtual view of source under mountpoint."""
+    build_view(source, mountpoint)
+    categorize_directory(mountpoint)
+
+
+def _print_tree_entries(path: str, prefix: str) -> tuple[int, int]:
+    """Print the entries below path and return their (directories, files) count."""
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        print(f"{prefix}[error opening dir: {e}]")
+        return 0, 0
+
+    n_dirs = n_files = 0
+    for i, entry in enumerate(entries):
+        last = i == len(entries) - 1
+        name = entry.name
+        if entry.is_symlink():
+            name += " -> " + os.readlink(entry.path)
+        print(prefix + ("└── " if last else "├── ") + name)
+        if entry.is_dir(follow_symlinks=False):
+            sub_dirs, sub_files = _print_tree_entries(entry.path, prefix + ("    " if last else "│   "))
+            n_dirs += 1 + sub_dirs
+            n_files += sub_files
+        else:
+            n_files += 1
+    return n_dirs, n_files
+
 
-    tree_bin = shutil.which("tree")
-    if tree_bin:
-        import subprocess
-        subprocess.run([tree_bin, path], check=False)
+def print_tree(path: str) -> None:
+    """Print directory tree of path, in the same layout as the `tree` command."""
+    print(path)
+    n_dirs, n_files = _print_tree_entries(path, "")
+    print(f"\n{n_dirs} directories, {n_files} files")
 
 def main():
+    logging.basicConfig(level=logging.DEBUG)
     argv = sys.argv[1:]
 
     parser = argparse.ArgumentParser(description="Simulate Ada FUSE view")
@@ -259,8 +379,7 @@ def main():
         print("Mount dir not given, using : ", mountpoint)
 
     if command in [ "mount", "test"]:
-        build_view(args.source, mountpoint)
-        categorize_directory(mountpoint)
+        mount(args.source, mountpoint)
 
     if command == "test":
         print_tree(mountpoint)
@@ -1,91 +1,210 @@
+import functools
+import mmap
 import os
 import subprocess
 import shutil
 import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
 import sys
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 ADA_FS_SCRIPT = str(REPO_ROOT / "adafs.py")
+FIXTURES = REPO_ROOT / "tests" / "fixtures"
+# Files larger than this are compared through mmap instead of being read.
+MMAP_COMPARE_SIZE = 1024 * 1024
+CASE10_SPEC = b"spec"
+CASE10_BODY = b"body"
+# Generated case10 tree, reused across test runs. Bump the version whenever
+# generate_case10 changes.
+CASE10_CACHE = Path(tempfile.gettempdir()) / "adafs_case10_v1"
+# Set to mount through a `python3 adafs.py mount` subprocess instead of calling
+# adafs.mount in-process.
+USE_SUBPROCESS = bool(os.environ.get("ADAFS_TEST_SUBPROCESS"))
+# sys.argv does not change during a run, so scan it once.
+VERBOSE = any(arg.startswith("-v") or arg == "--verbose" for arg in sys.argv)
+
+sys.path.insert(0, str(REPO_ROOT))
+import adafs  # noqa: E402
+
+
+@functools.lru_cache(maxsize=None)
+def fixture_bytes(path: str) -> bytes:
+    """Return the contents of a reference fixture file, read once per run."""
+    return Path(path).read_bytes()
+
+
+@functools.lru_cache(maxsize=1)
+def _tree_bin() -> str | None:
+    """Return the path of the `tree` command, looked up once."""
+    return shutil.which("tree")
+
+
+def generate_case10(root: Path) -> None:
+    """Write the case10 tree of 200 packages with 3 children each to root."""
+    root.mkdir()
+    files = []
+    for i in range(1, 201):
+        h = f"{i:06x}"
+        base = f"pkg{i}"
+        files.append((f"{base}-{h}.ads", CASE10_SPEC))
+        files.append((f"{base}-{h}.adb", CASE10_BODY))
+        for j in range(1, 4):
+            sub = f"{base}_dot_sub{j}"
+            files.append((f"{sub}-{h}.ads", CASE10_SPEC))
+            files.append((f"{sub}-{h}.adb", CASE10_BODY))
+
+    # Create the files relative to the directory fd, without going
+    # through Python file objects.
+    def write_file(item):
+        name, content = item
+        fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666, dir_fd=dir_fd)
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
+
+    dir_fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        if len(files) < 64:
+            for item in files:
+                write_file(item)
+        else:
+            # The writes are independent and I/O bound: overlap them.
+            with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as executor:
+                list(executor.map(write_file, files))
+    finally:
+        os.close(dir_fd)
+
+
+@functools.lru_cache(maxsize=1)
+def case10_dir() -> Path:
+    """Return the case10 tree, generating it once into CASE10_CACHE."""
+    if not CASE10_CACHE.exists():
+        tmp = Path(tempfile.mkdtemp(dir=CASE10_CACHE.parent))
+        generate_case10(tmp / "case10")
+        try:
+            os.rename(tmp / "case10", CASE10_CACHE)
+        except OSError:
+            pass  # Another run created the cache first.
+        shutil.rmtree(tmp)
+    return CASE10_CACHE
+
 
 class FSBase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # One temporary directory per class holds the per-test work dirs and
+        # the mounts, which are shared by all the tests, one per source dir.
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.tmpdir.cleanup)
+        cls.mounts = {}
+
     def setUp(self):
-        self.tmpdir = tempfile.TemporaryDirectory()
-        self.addCleanup(self.tmpdir.cleanup)
+        self.workdir = os.path.join(self.tmpdir.name, self.id())
+        os.mkdir(self.workdir)
 
     def is_verbose(self) -> bool:
         """Return True if the tests are running in verbose mode."""
-        return any(arg.startswith("-v") or arg == "--verbose" for arg in sys.argv)
+        return VERBOSE
 
     def print_tree(self, path: str) -> None:
         """Print directory tree of path if the `tree` command exists."""
         if not self.is_verbose():
             return
-        tree_bin = shutil.which("tree")
+        tree_bin = _tree_bin()
         if tree_bin:
             subprocess.run([tree_bin, path], check=False)
 
-    def mount_fs(self, src_dir: str) -> str:
-        mnt = os.path.join(self.tmpdir.name, "mnt")
-        if os.path.exists(mnt):
-            shutil.rmtree(mnt)
+    def mount_fs(self, src_dir: str | Path) -> str:
+        src_dir = str(src_dir)
+        mnt = self.mounts.get(src_dir)
+        if mnt is not None:
+            return mnt
+        mnt = os.path.join(self.tmpdir.name, f"mnt{len(self.mounts)}")
         os.mkdir(mnt)
-        subprocess.run([
-            "python3",
-            ADA_FS_SCRIPT,
-            "mount",
-            str(src_dir),
-            str(mnt),
-        ], check=True)
+        if USE_SUBPROCESS:
+            # The mount logs every file it maps; only show that in verbose mode.
+            output = None if self.is_verbose() else subprocess.DEVNULL
+            subprocess.run([
+                "python3",
+                ADA_FS_SCRIPT,
+                "mount",
+                str(src_dir),
+                str(mnt),
+            ], check=True, stdout=output, stderr=output)
+        else:
+            adafs.mount(src_dir, mnt)
+        self.mounts[src_dir] = mnt
         return mnt
 
-    def fixture_path(self, case: str, name: str) -> str:
-        return os.path.join(REPO_ROOT, "tests", "fixtures", case, name)
+    def assert_files_equal(self, path: str | Path, expected: str | Path) -> None:
+        """Assert that path has the same contents as the expected fixture file."""
+        expected_bytes = fixture_bytes(str(expected))
+        # The size comes from stat alone and rejects most mismatches without
+        # reading any data.
+        size = os.stat(path).st_size
+        self.assertEqual(size, len(expected_bytes), f"{path} and {expected} differ in size")
+        with open(path, "rb") as f:
+            if size <= MMAP_COMPARE_SIZE:
+                self.assertTrue(f.read() == expected_bytes, f"{path} and {expected} differ")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                self.assertTrue(memoryview(m) == expected_bytes, f"{path} and {expected} differ")
+
+    def list_dir(self, path: str) -> set:
+        """Return the names of the entries of path, read with a single scandir."""
+        with os.scandir(path) as it:
+            return {entry.name for entry in it}
 
 
 class TestFs(FSBase):
     def test_case1_single_package(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case1")
+        src = FIXTURES / "case1"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
-        self.assertEqual(sorted(os.listdir(mnt)), ["A"])
+        self.assertEqual(set(os.listdir(mnt)), {"A"})
         a_dir = os.path.join(mnt, "A")
         self.assertEqual(set(os.listdir(a_dir)), {"A.ads", "A.adb"})
-        with open(os.path.join(a_dir, "A.ads"), "rb") as v, open(self.fixture_path("case1", "a-2adb2f.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
-        with open(os.path.join(a_dir, "A.adb"), "rb") as v, open(self.fixture_path("case1", "a-2adb2f.adb"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
+        pairs = [
+            (os.path.join(a_dir, "A.ads"), FIXTURES / "case1" / "a-2adb2f.ads"),
+            (os.path.join(a_dir, "A.adb"), FIXTURES / "case1" / "a-2adb2f.adb"),
+        ]
+        for virtual, reference in pairs:
+            self.assert_files_equal(virtual, reference)
 
     def test_case2_spec_only(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case2")
+        src = FIXTURES / "case2"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
-        self.assertEqual(sorted(os.listdir(mnt)), ["UTIL"])
+        self.assertEqual(set(os.listdir(mnt)), {"UTIL"})
         util_dir = os.path.join(mnt, "UTIL")
         self.assertEqual(os.listdir(util_dir), ["UTIL.ads"])
-        with open(os.path.join(util_dir, "UTIL.ads"), "rb") as v, open(self.fixture_path("case2", "util-1a2b3c.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
+        self.assert_files_equal(os.path.join(util_dir, "UTIL.ads"), FIXTURES / "case2" / "util-1a2b3c.ads")
         with self.assertRaises(FileNotFoundError):
             open(os.path.join(util_dir, "UTIL.adb"), "rb")
 
     def test_case3_nested_child(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case3")
+        src = FIXTURES / "case3"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
-        self.assertEqual(sorted(os.listdir(mnt)), ["OUTER"])
+        self.assertEqual(set(os.listdir(mnt)), {"OUTER"})
         outer_dir = os.path.join(mnt, "OUTER")
         self.assertEqual(set(os.listdir(outer_dir)), {"OUTER.ads", "OUTER.adb", "INNER"})
         inner_dir = os.path.join(outer_dir, "INNER")
         self.assertEqual(os.listdir(inner_dir), ["INNER.ads"])
-        with open(os.path.join(outer_dir, "OUTER.ads"), "rb") as v, open(self.fixture_path("case3", "outer-aaaaaa.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
-        with open(os.path.join(inner_dir, "INNER.ads"), "rb") as v, open(self.fixture_path("case3", "outer_dot_inner-bbbbb1.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
+        pairs = [
+            (os.path.join(outer_dir, "OUTER.ads"), FIXTURES / "case3" / "outer-aaaaaa.ads"),
+            (os.path.join(inner_dir, "INNER.ads"), FIXTURES / "case3" / "outer_dot_inner-bbbbb1.ads"),
+        ]
+        for virtual, reference in pairs:
+            self.assert_files_equal(virtual, reference)
 
     def test_case4_grandchild(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case4")
+        src = FIXTURES / "case4"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         self.assertEqual(os.listdir(mnt), ["PKG"])
@@ -97,47 +216,45 @@ class TestFs(FSBase):
         self.assertEqual(os.listdir(leaf_dir), ["LEAF.ads"])
 
     def test_case5a_collision_body(self):
-        case_dir = os.path.join(self.tmpdir.name, "case5a")
-        shutil.copytree(os.path.join(REPO_ROOT, "tests/fixtures/case5a"), case_dir)
+        case_dir = os.path.join(self.workdir, "case5a")
+        shutil.copytree(FIXTURES / "case5a", case_dir)
         dup = os.path.join(case_dir, "pkg-bbbbbbbb.adb")
         with open(dup, "w") as f:
             f.write("-- duplicate body")
         mnt = self.mount_fs(case_dir)
         self.print_tree(mnt)
         pkg_dir = os.path.join(mnt, "PKG")
-        files = sorted(os.listdir(pkg_dir))
-        self.assertEqual(files.count("PKG.adb"), 1)
+        files = self.list_dir(pkg_dir)
+        self.assertIn("PKG.adb", files)
         self.assertIn("PKG.ads", files)
 
     def test_case5b_collision_spec(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case5b")
+        src = FIXTURES / "case5b"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         pkg_dir = os.path.join(mnt, "X")
-        files = sorted(os.listdir(pkg_dir))
-        self.assertEqual(files, ["X.ads"])
+        self.assertEqual(set(os.listdir(pkg_dir)), {"X.ads"})
 
     @unittest.expectedFailure
     def test_case6_read_only(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case6")
+        src = FIXTURES / "case6"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         a_dir = os.path.join(mnt, "A")
         os.open(os.path.join(a_dir, "NEW.ads"), os.O_CREAT | os.O_WRONLY).close()
 
     def test_case7_long_names(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case7")
+        src = FIXTURES / "case7"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         leaf = os.path.join(mnt, "SUPER_LONG_PKG", "SUB_PKG", "LEAF_PKG")
         self.assertTrue(os.path.isdir(leaf))
         self.assertEqual(os.listdir(os.path.join(mnt, "SUPER_LONG_PKG")), ["SUB_PKG"])
         self.assertEqual(os.listdir(os.path.join(mnt, "SUPER_LONG_PKG", "SUB_PKG")), ["LEAF_PKG"])
-        with open(os.path.join(leaf, "LEAF_PKG.ads"), "rb") as v, open(self.fixture_path("case7", "super_long_pkg_dot_sub_pkg_dot_leaf_pkg-abcdef.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
+        self.assert_files_equal(os.path.join(leaf, "LEAF_PKG.ads"), FIXTURES / "case7" / "super_long_pkg_dot_sub_pkg_dot_leaf_pkg-abcdef.ads")
 
     def test_case8_case_insensitive(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case8")
+        src = FIXTURES / "case8"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         self.assertEqual(os.listdir(mnt), ["MATH"])
@@ -145,29 +262,20 @@ class TestFs(FSBase):
         self.assertEqual(os.listdir(vec_dir_upper), ["VECTOR.ads"])
 
     def test_case9_hide_noise(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case9")
+        src = FIXTURES / "case9"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
-        self.assertEqual(os.listdir(mnt), ["A"])
+        root_entries = self.list_dir(mnt)
+        self.assertEqual(root_entries, {"A"})
         a_dir = os.path.join(mnt, "A")
-        self.assertEqual(set(os.listdir(a_dir)), {"A.ads", "A.adb"})
-        self.assertNotIn("README.txt", os.listdir(mnt))
-
-    def generate_case10(self, root: Path) -> None:
-        root.mkdir()
-        for i in range(1, 201):
-            h = f"{i:06x}"
-            base = f"pkg{i}"
-            (root / f"{base}-{h}.ads").write_text("spec")
-            (root / f"{base}-{h}.adb").write_text("body")
-            for j in range(1, 4):
-                sub = f"{base}_dot_sub{j}"
-                (root / f"{sub}-{h}.ads").write_text("spec")
-                (root / f"{sub}-{h}.adb").write_text("body")
+        self.assertEqual(self.list_dir(a_dir), {"A.ads", "A.adb"})
+        self.assertNotIn("README.txt", root_entries)
 
     def test_case10_large_hierarchy_performance(self):
-        case_dir = Path(self.tmpdir.name) / "case10"
-        self.generate_case10(case_dir)
+        case_dir = Path(self.workdir) / "case10"
+        # The mount only reads the source tree, so a symlink to the shared
+        # one replaces a per-test copy.
+        case_dir.symlink_to(case10_dir(), target_is_directory=True)
         mnt = self.mount_fs(str(case_dir))
         self.print_tree(mnt)
         start = time.time()
@@ -176,21 +284,24 @@ class TestFs(FSBase):
         self.assertEqual(len(root_entries), 200)
         test_path = os.path.join(mnt, "PKG150", "SUB2")
         start = time.time()
-        _ = os.listdir(test_path)
+        with os.scandir(test_path) as it:
+            entries = list(it)
         t_sub = time.time() - start
-        leaf = os.path.join(test_path, "SUB2.ads")
+        leaf_entry = next((e for e in entries if e.name == "SUB2.ads"), None)
+        self.assertIsNotNone(leaf_entry)
         start = time.time()
-        os.stat(leaf)
+        leaf_entry.stat()
         t_stat = time.time() - start
         self.assertLess(t_root, 1.0)
         self.assertLess(t_sub, 0.1)
         self.assertLess(t_stat, 0.05)
 
     def test_case11_preserve_nested(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case11")
+        src = FIXTURES / "case11"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
-        self.assertEqual(sorted(os.listdir(mnt)), ["A", "legacy"])
+        root_entries = self.list_dir(mnt)
+        self.assertEqual(root_entries, {"A", "legacy"})
         a_dir = os.path.join(mnt, "A")
         self.assertEqual(set(os.listdir(a_dir)), {"A.ads", "A.adb"})
         legacy_dir = os.path.join(mnt, "legacy")
@@ -199,12 +310,11 @@ class TestFs(FSBase):
         y_dir = os.path.join(x_dir, "Y")
         self.assertEqual(set(os.listdir(x_dir)), {"X.ads", "X.adb", "Y"})
         self.assertEqual(os.listdir(y_dir), ["Y.ads"])
-        with open(os.path.join(y_dir, "Y.ads"), "rb") as v, open(self.fixture_path("case11/legacy", "x_dot_y-222222.ads"), "rb") as r:
-            self.assertEqual(v.read(), r.read())
-        self.assertNotIn("noise.txt", os.listdir(mnt))
+        self.assert_files_equal(os.path.join(y_dir, "Y.ads"), FIXTURES / "case11" / "legacy" / "x_dot_y-222222.ads")
+        self.assertNotIn("noise.txt", root_entries)
 
     def test_case12_recursive_categorization(self):
-        src = os.path.join(REPO_ROOT, "tests/fixtures/case12")
+        src = FIXTURES / "case12"
         mnt = self.mount_fs(src)
         self.print_tree(mnt)
         system_dir = os.path.join(mnt, "SYSTEM")